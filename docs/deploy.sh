@@ -21,6 +21,21 @@ IMAGE_BUCKET="${PROJECT_NAME}-images"
 LAMBDA_FUNCTION="${PROJECT_NAME}-thumbnail-generator"
 SNS_TOPIC="${PROJECT_NAME}-image-processing"
 LAMBDA_ROLE="${PROJECT_NAME}-lambda-s3-sns-role"
+PILLOW_LAYER="${PROJECT_NAME}-pillow-layer"
+
+LAMBDA_ARCH="${LAMBDA_ARCH:-arm64}"
+
+# Pillow layer build settings (Pillow-SIMD AVX2 kernels on x86_64; stock
+# Pillow on arm64, where libjpeg-turbo's NEON codec is the SIMD path)
+if [ "$LAMBDA_ARCH" = "arm64" ]; then
+    LAYER_PLATFORM="linux/arm64"
+    LAYER_BUILD_IMAGE="public.ecr.aws/lambda/python:3.11-arm64"
+    LAYER_CC="cc"
+else
+    LAYER_PLATFORM="linux/amd64"
+    LAYER_BUILD_IMAGE="public.ecr.aws/lambda/python:3.11-x86_64"
+    LAYER_CC="cc -mavx2"
+fi
 
 # Get AWS Account ID
 ACCOUNT_ID=$(aws sts get-caller-identity --query Account --output text 2>/dev/null)
@@ -83,6 +98,13 @@ verify_prerequisites() {
         exit 1
     fi
     print_step "zip command found"
+    
+    # Check Docker (used to build the Pillow layer)
+    if ! command -v docker &> /dev/null; then
+        print_error "Docker not found. It is required to build the Pillow layer."
+        exit 1
+    fi
+    print_step "Docker found: $(docker --version)"
 }
 
 # S3 Bucket Creation
@@ -211,9 +233,14 @@ create_iam_role() {
     },
     {
       "Effect": "Allow",
-      "Action": ["s3:PutObject"],
+      "Action": ["s3:GetObject", "s3:PutObject"],
       "Resource": "arn:aws:s3:::${DEST_BUCKET}/*"
     },
+    {
+      "Effect": "Allow",
+      "Action": ["s3:ListBucket"],
+      "Resource": "arn:aws:s3:::${DEST_BUCKET}"
+    },
     {
       "Effect": "Allow",
       "Action": ["sns:Publish"],
@@ -236,6 +263,52 @@ EOF
     echo "$ROLE_ARN"
 }
 
+# Pillow Layer Build
+build_pillow_layer() {
+    print_header "Building Pillow Layer"
+    
+    LAYER_DIR="layer_build"
+    rm -rf "$LAYER_DIR" pillow-layer.zip
+    mkdir -p "$LAYER_DIR"
+    
+    # Compile Pillow against libjpeg-turbo inside the Lambda build image so the
+    # SIMD resize and JPEG codec paths match the target runtime; the
+    # requirements markers pick Pillow-SIMD on x86_64 and Pillow on aarch64
+    docker run --rm \
+        --platform "$LAYER_PLATFORM" \
+        -v "$(pwd):/work" -w /work \
+        --entrypoint /bin/bash \
+        "$LAYER_BUILD_IMAGE" -c "
+            yum install -y -q gcc libjpeg-turbo-devel turbojpeg zlib-devel &&
+            CC='${LAYER_CC}' pip install -q --no-cache-dir --no-binary :all: \
+                -r <(grep -i '^Pillow' requirements.txt) \
+                -t ${LAYER_DIR}/python &&
+            pip install -q --no-cache-dir \
+                \$(grep -i -E '^(PyTurboJPEG|numpy)' requirements.txt) \
+                -t ${LAYER_DIR}/python &&
+            mkdir -p ${LAYER_DIR}/lib &&
+            cp -P /usr/lib64/libjpeg.so.62* /usr/lib64/libturbojpeg.so.0* ${LAYER_DIR}/lib/ &&
+            PYTHONPATH=${LAYER_DIR}/python python -c \
+                'from PIL import features; assert features.check_feature(\"libjpeg_turbo\"), features.pilinfo()'
+        "
+    print_step "Compiled Pillow and TurboJPEG with libjpeg-turbo ($LAMBDA_ARCH)"
+    
+    cd "$LAYER_DIR"
+    zip -r -q -y ../pillow-layer.zip python lib
+    cd ..
+    
+    LAYER_ARN=$(aws lambda publish-layer-version \
+        --layer-name "$PILLOW_LAYER" \
+        --zip-file fileb://pillow-layer.zip \
+        --compatible-runtimes python3.11 \
+        --compatible-architectures "$LAMBDA_ARCH" \
+        --region "$REGION" \
+        --query 'LayerVersionArn' \
+        --output text)
+    
+    print_step "Layer published: $LAYER_ARN"
+}
+
 # Lambda Function Packaging
 package_lambda() {
     print_header "Packaging Lambda Function"
@@ -259,8 +332,8 @@ package_lambda() {
     cp lambda-function.py "$BUILD_DIR/index.py"
     print_step "Copied Lambda function code"
     
-    # Install dependencies
-    pip install -q Pillow boto3 -t "$BUILD_DIR/" 2>/dev/null
+    # Install dependencies (Pillow is provided by the layer)
+    pip install -q boto3 -t "$BUILD_DIR/" 2>/dev/null
     print_step "Installed Python dependencies"
     
     # Create zip file
@@ -291,12 +364,14 @@ create_lambda_function() {
     LAMBDA_ARN=$(aws lambda create-function \
         --function-name "$LAMBDA_FUNCTION" \
         --runtime python3.11 \
+        --architectures "$LAMBDA_ARCH" \
         --role "$ROLE_ARN" \
         --handler index.lambda_handler \
         --zip-file fileb://lambda_function.zip \
         --timeout 30 \
         --memory-size 512 \
-        --environment "Variables={THUMBNAIL_BUCKET=${DEST_BUCKET},SNS_TOPIC_ARN=${TOPIC_ARN}}" \
+        --layers "$LAYER_ARN" \
+        --environment "Variables={THUMBNAIL_BUCKET=${DEST_BUCKET},SNS_TOPIC_ARN=${TOPIC_ARN},TURBOJPEG_LIB_PATH=/opt/lib/libturbojpeg.so.0,LOG_LEVEL=WARNING}" \
         --region "$REGION" \
         --query 'FunctionArn' \
         --output text 2>/dev/null) || \
@@ -416,8 +491,10 @@ display_summary() {
     echo "  Name: $LAMBDA_FUNCTION"
     echo "  ARN: $LAMBDA_ARN"
     echo "  Runtime: Python 3.11"
+    echo "  Architecture: $LAMBDA_ARCH"
     echo "  Memory: 512 MB"
     echo "  Timeout: 30 seconds"
+    echo "  Layer: $LAYER_ARN"
     
     echo -e "\n${BLUE}SNS Topic:${NC}"
     echo "  Name: $SNS_TOPIC"
@@ -442,6 +519,7 @@ display_summary() {
     echo "  aws s3 rm s3://${DEST_BUCKET} --recursive"
     echo "  aws s3 rb s3://${DEST_BUCKET}"
     echo "  aws lambda delete-function --function-name ${LAMBDA_FUNCTION}"
+    echo "  aws lambda delete-layer-version --layer-name ${PILLOW_LAYER} --version-number ${LAYER_ARN##*:}"
     echo "  aws sns delete-topic --topic-arn ${TOPIC_ARN}"
     echo "  aws iam delete-role-policy --role-name ${LAMBDA_ROLE} --policy-name ${PROJECT_NAME}-inline-policy"
     echo "  aws iam delete-role --role-name ${LAMBDA_ROLE}"
@@ -457,6 +535,7 @@ main() {
     create_s3_buckets
     create_sns_topic
     ROLE_ARN=$(create_iam_role)
+    build_pillow_layer
     package_lambda
     create_lambda_function
     configure_s3_trigger
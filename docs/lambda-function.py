@@ -5,108 +5,66 @@
 import json
 import boto3
 import os
+import numpy as np
 from PIL import Image
 from io import BytesIO
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-sns_client = boto3.client('sns')
+# Initialize AWS clients (reused across warm invocations)
+# Connection pool is sized above MAX_WORKERS so parallel records never wait on a socket
+aws_config = Config(
+    max_pool_connections=32,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+s3_client = boto3.client('s3', config=aws_config)
+sns_client = boto3.client('sns', config=aws_config)
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())  # WARNING in production, DEBUG for verbose banners
+
+# Initialize libjpeg-turbo for scaled JPEG decoding (optional, from the layer)
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    turbo_jpeg = TurboJPEG(os.environ.get('TURBOJPEG_LIB_PATH'))
+except (ImportError, RuntimeError, OSError) as turbo_error:
+    logger.warning("TurboJPEG unavailable, decoding with Pillow only: %s", turbo_error)
+    turbo_jpeg = None
 
 # Environment variables
 THUMBNAIL_BUCKET = os.environ.get('THUMBNAIL_BUCKET')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
 THUMBNAIL_SIZE = (200, 200)
 THUMBNAIL_QUALITY = 80
+THUMBNAIL_BUFFER_SIZE = max(8192, THUMBNAIL_SIZE[0] * THUMBNAIL_SIZE[1] // 4)  # ~0.25 B/px JPEG estimate
+DECODE_SIZE = (THUMBNAIL_SIZE[0] * 2, THUMBNAIL_SIZE[1] * 2)  # Smallest scaled JPEG decode kept for Lanczos
+TURBOJPEG_SCALING_FACTORS = ((1, 8), (1, 4), (1, 2))  # Scaled IDCTs with SIMD kernels, smallest first
+MAX_WORKERS = 8  # Concurrent records per invocation (boto3 clients are thread-safe)
+SNS_BATCH_SIZE = 10  # PublishBatch limit
+PROBE_BYTES = 64 * 1024  # Ranged GET used to read the image header
+RANGED_GET_THRESHOLD = 8 * 1024 * 1024  # Objects above this are fetched in parallel ranges
+RANGED_GET_PARTS = 4  # MAX_WORKERS * RANGED_GET_PARTS stays within the connection pool
+RANGED_GET_CHUNK_SIZE = 1024 * 1024  # Read size when copying a part into the download buffer
 
-def lambda_handler(event, context):
-    """
-    Main Lambda handler function
-    Triggered by S3 ObjectCreated events
-    Generates thumbnails and sends SNS notifications
-    
-    Args:
-        event: S3 event from Lambda trigger
-        context: Lambda context object
-    
-    Returns:
-        dict: Lambda response with status code and body
-    """
-    
-    try:
-        logger.info(f"Lambda function triggered at {datetime.now()}")
-        logger.info(f"Event: {json.dumps(event)}")
-        
-        # Process all records from the S3 event
-        for record in event.get('Records', []):
-            try:
-                # Extract S3 bucket and object information
-                bucket_name = record['s3']['bucket']['name']
-                object_key = record['s3']['object']['key']
-                
-                logger.info(f"Processing image: s3://{bucket_name}/{object_key}")
-                
-                # Download the original image from S3
-                response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-                image_data = response['Body'].read()
-                
-                logger.info(f"Downloaded image size: {len(image_data)} bytes")
-                
-                # Open image using PIL
-                image = Image.open(BytesIO(image_data))
-                
-                # Log original image details
-                logger.info(f"Original image format: {image.format}, Size: {image.size}")
-                
-                # Convert RGBA to RGB if necessary (for JPEG compatibility)
-                if image.mode in ('RGBA', 'LA', 'P'):
-                    # Create white background
-                    background = Image.new('RGB', image.size, (255, 255, 255))
-                    if image.mode == 'P':
-                        image = image.convert('RGBA')
-                    background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-                    image = background
-                
-                # Generate thumbnail with fixed size
-                image.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-                
-                logger.info(f"Thumbnail generated: {image.size}")
-                
-                # Save thumbnail to BytesIO buffer
-                thumbnail_buffer = BytesIO()
-                image.save(thumbnail_buffer, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
-                thumbnail_buffer.seek(0)
-                
-                # Generate thumbnail file name
-                # Extract original filename without extension
-                filename_without_ext = os.path.splitext(object_key)[0]
-                thumbnail_key = f"thumbnails/{os.path.basename(filename_without_ext)}_thumb.jpg"
-                
-                logger.info(f"Uploading thumbnail to: s3://{THUMBNAIL_BUCKET}/{thumbnail_key}")
-                
-                # Upload thumbnail to destination bucket
-                s3_client.put_object(
-                    Bucket=THUMBNAIL_BUCKET,
-                    Key=thumbnail_key,
-                    Body=thumbnail_buffer.getvalue(),
-                    ContentType='image/jpeg',
-                    Metadata={
-                        'original-image': object_key,
-                        'source-bucket': bucket_name,
-                        'generated-by': 'Lambda-ThumbnailGenerator',
-                        'generation-time': datetime.now().isoformat()
-                    }
-                )
-                
-                logger.info(f"Thumbnail uploaded successfully: {len(thumbnail_buffer.getvalue())} bytes")
-                
-                # Prepare success notification message
-                success_message = f"""
+# SNS notification templates
+# Compact one-line messages are sent by default; the verbose banners are
+# only rendered when DEBUG logging is enabled
+SUCCESS_TEMPLATE = (
+    "THUMBNAIL OK src=s3://{bucket_name}/{object_key} ({image_format}, {image_size} B) "
+    "dst=s3://{thumbnail_bucket}/{thumbnail_key} ({thumbnail_bytes} B) q={quality} ts={timestamp}"
+)
+ERROR_TEMPLATE = "THUMBNAIL ERROR src=s3://{bucket_name}/{object_key} {error_type}: {error} ts={timestamp}"
+CRITICAL_TEMPLATE = (
+    "THUMBNAIL CRITICAL {error_type}: {error} bucket={thumbnail_bucket} "
+    "topic={sns_topic_arn} size={thumbnail_dimensions} ts={timestamp}"
+)
+
+SUCCESS_BANNER = """
 ╔════════════════════════════════════════════════════════╗
 ║     IMAGE PROCESSING COMPLETED SUCCESSFULLY            ║
 ╚════════════════════════════════════════════════════════╝
@@ -114,50 +72,37 @@ def lambda_handler(event, context):
 📸 ORIGINAL IMAGE DETAILS:
    • File Name: {object_key}
    • Source Bucket: {bucket_name}
-   • File Size: {len(image_data)} bytes
-   • Format: {image.format}
+   • File Size: {image_size} bytes
+   • Format: {image_format}
 
 🖼️  THUMBNAIL GENERATED:
    • Thumbnail Name: {thumbnail_key}
-   • Destination Bucket: {THUMBNAIL_BUCKET}
-   • Thumbnail Size: {thumbnail_size_text(thumbnail_buffer)}
-   • Dimensions: {THUMBNAIL_SIZE[0]}x{THUMBNAIL_SIZE[1]} pixels
-   • Quality: {THUMBNAIL_QUALITY}%
+   • Destination Bucket: {thumbnail_bucket}
+   • Thumbnail Size: {thumbnail_bytes} B
+   • Dimensions: {width}x{height} pixels
+   • Quality: {quality}%
 
 ⏰ PROCESSING TIME: 
-   • Timestamp: {datetime.now().isoformat()}
+   • Timestamp: {timestamp}
    • Status: SUCCESS ✓
 
 ───────────────────────────────────────────────────────────
 Generated by: Project 1 Lambda Thumbnail Generator
-                """
-                
-                # Send success notification via SNS
-                sns_client.publish(
-                    TopicArn=SNS_TOPIC_ARN,
-                    Subject=f'✓ Thumbnail Generated: {os.path.basename(object_key)}',
-                    Message=success_message
-                )
-                
-                logger.info("Success notification sent via SNS")
-                
-            except Exception as record_error:
-                logger.error(f"Error processing record: {str(record_error)}")
-                
-                # Send error notification
-                error_message = f"""
+"""
+
+ERROR_BANNER = """
 ╔════════════════════════════════════════════════════════╗
 ║        IMAGE PROCESSING ERROR OCCURRED                 ║
 ╚════════════════════════════════════════════════════════╝
 
 ❌ ERROR DETAILS:
-   • Error Type: {type(record_error).__name__}
-   • Error Message: {str(record_error)}
-   • Timestamp: {datetime.now().isoformat()}
+   • Error Type: {error_type}
+   • Error Message: {error}
+   • Timestamp: {timestamp}
 
 📍 CONTEXT:
-   • Bucket: {record.get('s3', {}).get('bucket', {}).get('name', 'Unknown')}
-   • Object Key: {record.get('s3', {}).get('object', {}).get('key', 'Unknown')}
+   • Bucket: {bucket_name}
+   • Object Key: {object_key}
 
 🔧 TROUBLESHOOTING:
    1. Check that the file is a valid image (JPG, PNG)
@@ -167,48 +112,22 @@ Generated by: Project 1 Lambda Thumbnail Generator
 
 ───────────────────────────────────────────────────────────
 Generated by: Project 1 Lambda Thumbnail Generator
-                """
-                
-                sns_client.publish(
-                    TopicArn=SNS_TOPIC_ARN,
-                    Subject=f'❌ Error Processing Image: {record.get("s3", {}).get("object", {}).get("key", "Unknown")}',
-                    Message=error_message
-                )
-                
-                # Continue processing other records
-                continue
-        
-        # Success response
-        response = {
-            'statusCode': 200,
-            'body': json.dumps({
-                'message': 'Thumbnail generation completed successfully',
-                'records_processed': len(event.get('Records', [])),
-                'timestamp': datetime.now().isoformat()
-            })
-        }
-        
-        logger.info(f"Lambda execution completed successfully")
-        return response
-        
-    except Exception as main_error:
-        logger.error(f"Critical error in Lambda handler: {str(main_error)}")
-        
-        # Send critical error notification
-        critical_message = f"""
+"""
+
+CRITICAL_BANNER = """
 ╔════════════════════════════════════════════════════════╗
 ║        CRITICAL LAMBDA EXECUTION ERROR                 ║
 ╚════════════════════════════════════════════════════════╝
 
 🚨 CRITICAL ERROR:
-   • Error: {str(main_error)}
-   • Type: {type(main_error).__name__}
-   • Timestamp: {datetime.now().isoformat()}
+   • Error: {error}
+   • Type: {error_type}
+   • Timestamp: {timestamp}
 
 ⚙️  ENVIRONMENT:
-   • Thumbnail Bucket: {THUMBNAIL_BUCKET}
-   • SNS Topic ARN: {SNS_TOPIC_ARN}
-   • Thumbnail Size: {THUMBNAIL_SIZE}
+   • Thumbnail Bucket: {thumbnail_bucket}
+   • SNS Topic ARN: {sns_topic_arn}
+   • Thumbnail Size: {thumbnail_dimensions}
 
 📋 ACTION REQUIRED:
    Review CloudWatch logs immediately for detailed stack trace
@@ -216,7 +135,89 @@ Generated by: Project 1 Lambda Thumbnail Generator
 
 ───────────────────────────────────────────────────────────
 Generated by: Project 1 Lambda Thumbnail Generator
-        """
+"""
+
+
+def warm_up_codecs():
+    """
+    Round-trip a tiny JPEG so libjpeg and the Pillow plugins are loaded
+    during Lambda init instead of on the first invocation
+    """
+    warm_buffer = BytesIO()
+    Image.new('RGB', (16, 16)).save(warm_buffer, format='JPEG', quality=THUMBNAIL_QUALITY)
+    Image.open(BytesIO(warm_buffer.getvalue())).load()
+    if turbo_jpeg is not None:
+        turbo_jpeg.decode(warm_buffer.getvalue())
+
+
+warm_up_codecs()
+
+
+def lambda_handler(event, context):
+    """
+    Main Lambda handler function
+    Triggered by S3 ObjectCreated events
+    Generates thumbnails and sends SNS notifications
+    
+    Args:
+        event: S3 event from Lambda trigger
+        context: Lambda context object
+    
+    Returns:
+        dict: Lambda response with status code and body
+    """
+    
+    # Single timestamp for the whole invocation, shared by every record
+    invoke_ts = datetime.now().isoformat()
+    
+    try:
+        logger.info("Lambda function triggered at %s", invoke_ts)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Event: %s", json.dumps(event))
+        
+        # Process all records from the S3 event in parallel
+        records = event.get('Records', [])
+        notifications = []
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(records) or 1)) as executor:
+            futures = [executor.submit(process_record, record, invoke_ts) for record in records]
+            for future in as_completed(futures):
+                try:
+                    notification = future.result()
+                    if notification is not None:
+                        notifications.append(notification)
+                except Exception as record_error:
+                    logger.error("Unhandled error in record worker: %s", record_error)
+        
+        # Send all success/error notifications in batched SNS requests
+        publish_notifications(notifications)
+        
+        # Success response
+        response = {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Thumbnail generation completed successfully',
+                'records_processed': len(records),
+                'timestamp': invoke_ts
+            })
+        }
+        
+        logger.info("Lambda execution completed successfully")
+        return response
+        
+    except Exception as main_error:
+        logger.error("Critical error in Lambda handler: %s", main_error)
+        
+        # Send critical error notification
+        critical_fields = {
+            'error': str(main_error),
+            'error_type': type(main_error).__name__,
+            'timestamp': invoke_ts,
+            'thumbnail_bucket': THUMBNAIL_BUCKET,
+            'sns_topic_arn': SNS_TOPIC_ARN,
+            'thumbnail_dimensions': THUMBNAIL_SIZE
+        }
+        critical_template = CRITICAL_BANNER if logger.isEnabledFor(logging.DEBUG) else CRITICAL_TEMPLATE
+        critical_message = critical_template.format_map(critical_fields)
         
         try:
             sns_client.publish(
@@ -225,7 +226,7 @@ Generated by: Project 1 Lambda Thumbnail Generator
                 Message=critical_message
             )
         except Exception as sns_error:
-            logger.error(f"Failed to send error notification: {str(sns_error)}")
+            logger.error("Failed to send error notification: %s", sns_error)
         
         # Error response
         return {
@@ -233,17 +234,413 @@ Generated by: Project 1 Lambda Thumbnail Generator
             'body': json.dumps({
                 'error': 'Lambda execution failed',
                 'message': str(main_error),
-                'timestamp': datetime.now().isoformat()
+                'timestamp': invoke_ts
             })
         }
 
 
-def thumbnail_size_text(buffer):
-    """Helper function to format buffer size in readable format"""
-    size_bytes = buffer.getbuffer().nbytes
-    if size_bytes < 1024:
-        return f"{size_bytes} B"
-    elif size_bytes < 1024 * 1024:
-        return f"{size_bytes / 1024:.2f} KB"
-    else:
-        return f"{size_bytes / (1024 * 1024):.2f} MB"
+def process_record(record, invoke_ts):
+    """
+    Generate a thumbnail for a single S3 event record
+    
+    Errors are handled here so one bad object does not fail the other
+    records; either outcome is reported through the returned notification.
+    
+    Args:
+        record: One entry from the S3 event Records list
+        invoke_ts: ISO timestamp of the Lambda invocation
+    
+    Returns:
+        dict: SNS notification for the record ('Subject' and 'Message'),
+        or None when the thumbnail already exists (duplicate delivery)
+    """
+    
+    try:
+        # Extract S3 bucket and object information
+        bucket_name = record['s3']['bucket']['name']
+        object_key = record['s3']['object']['key']
+        
+        logger.info("Processing image: s3://%s/%s", bucket_name, object_key)
+        
+        # Generate thumbnail file name
+        # Extract original filename without extension
+        filename_without_ext = os.path.splitext(object_key)[0]
+        thumbnail_key = f"thumbnails/{os.path.basename(filename_without_ext)}_thumb.jpg"
+        
+        thumbnail_metadata = {
+            'original-image': object_key,
+            'source-bucket': bucket_name,
+            'source-etag': record['s3']['object'].get('eTag', ''),
+            'generated-by': 'Lambda-ThumbnailGenerator',
+            'generation-time': invoke_ts
+        }
+        
+        # S3 events can be delivered more than once; skip the download and
+        # resize when an earlier invocation already rendered this source version
+        if thumbnail_exists(thumbnail_key, thumbnail_metadata):
+            logger.info("Thumbnail already up to date, skipping: s3://%s/%s", THUMBNAIL_BUCKET, thumbnail_key)
+            return None
+        
+        # Read just the image header to learn its size and format
+        probe_data, image_size, image_etag, image_dimensions, image_format = probe_image(bucket_name, object_key)
+        
+        logger.info("Source image size: %d bytes, Format: %s, Dimensions: %s",
+                    image_size, image_format, image_dimensions)
+        
+        if image_format == 'JPEG' and image_dimensions and max(image_dimensions) <= max(THUMBNAIL_SIZE):
+            # Already a thumbnail-sized JPEG: server-side copy, no decode/encode
+            logger.info("Copying image as thumbnail to: s3://%s/%s", THUMBNAIL_BUCKET, thumbnail_key)
+            
+            s3_client.copy_object(
+                CopySource={'Bucket': bucket_name, 'Key': object_key},
+                Bucket=THUMBNAIL_BUCKET,
+                Key=thumbnail_key,
+                ContentType='image/jpeg',
+                MetadataDirective='REPLACE',
+                Metadata=thumbnail_metadata
+            )
+            thumbnail_bytes = image_size
+        else:
+            # Reuse the probe when it already holds the whole object, otherwise
+            # fetch only the bytes after it (in parallel ranges for large objects)
+            if image_size <= len(probe_data):
+                image_stream = BytesIO(probe_data)
+            else:
+                parts = RANGED_GET_PARTS if image_size > RANGED_GET_THRESHOLD else 1
+                image_stream = download_ranged(bucket_name, object_key, image_size, image_etag, probe_data, parts)
+            
+            thumbnail_buffer, thumbnail_bytes, image_format = render_thumbnail(image_stream)
+            
+            logger.info("Uploading thumbnail to: s3://%s/%s", THUMBNAIL_BUCKET, thumbnail_key)
+            
+            # Upload thumbnail to destination bucket
+            s3_client.put_object(
+                Bucket=THUMBNAIL_BUCKET,
+                Key=thumbnail_key,
+                Body=thumbnail_buffer,
+                ContentType='image/jpeg',
+                Metadata=thumbnail_metadata
+            )
+        
+        logger.info("Thumbnail uploaded successfully: %d bytes", thumbnail_bytes)
+        
+        # Prepare success notification message
+        success_fields = {
+            'object_key': object_key,
+            'bucket_name': bucket_name,
+            'image_size': image_size,
+            'image_format': image_format,
+            'thumbnail_key': thumbnail_key,
+            'thumbnail_bucket': THUMBNAIL_BUCKET,
+            'thumbnail_bytes': thumbnail_bytes,
+            'width': THUMBNAIL_SIZE[0],
+            'height': THUMBNAIL_SIZE[1],
+            'quality': THUMBNAIL_QUALITY,
+            'timestamp': invoke_ts
+        }
+        success_template = SUCCESS_BANNER if logger.isEnabledFor(logging.DEBUG) else SUCCESS_TEMPLATE
+        success_message = success_template.format_map(success_fields)
+        
+        # Success notification, sent by the handler via SNS
+        return {
+            'Subject': f'✓ Thumbnail Generated: {os.path.basename(object_key)}',
+            'Message': success_message
+        }
+        
+    except Exception as record_error:
+        logger.error("Error processing record: %s", record_error)
+        
+        # Send error notification
+        error_fields = {
+            'error_type': type(record_error).__name__,
+            'error': str(record_error),
+            'timestamp': invoke_ts,
+            'bucket_name': record.get('s3', {}).get('bucket', {}).get('name', 'Unknown'),
+            'object_key': record.get('s3', {}).get('object', {}).get('key', 'Unknown')
+        }
+        error_template = ERROR_BANNER if logger.isEnabledFor(logging.DEBUG) else ERROR_TEMPLATE
+        error_message = error_template.format_map(error_fields)
+        
+        return {
+            'Subject': f'❌ Error Processing Image: {error_fields["object_key"]}',
+            'Message': error_message
+        }
+
+
+def publish_notifications(notifications):
+    """
+    Publish record notifications to SNS in batches
+    
+    Uses PublishBatch so a multi-record event costs one SNS request per
+    SNS_BATCH_SIZE notifications instead of one per record.
+    
+    Args:
+        notifications: List of dicts with 'Subject' and 'Message' keys
+    """
+    for start in range(0, len(notifications), SNS_BATCH_SIZE):
+        batch = notifications[start:start + SNS_BATCH_SIZE]
+        response = sns_client.publish_batch(
+            TopicArn=SNS_TOPIC_ARN,
+            PublishBatchRequestEntries=[
+                {'Id': str(start + index), **notification}
+                for index, notification in enumerate(batch)
+            ]
+        )
+        
+        for failure in response.get('Failed', []):
+            logger.error("Failed to send notification %s: %s", failure['Id'], failure.get('Message'))
+    
+    logger.info("%d notification(s) sent via SNS", len(notifications))
+
+
+def render_thumbnail(image_stream):
+    """
+    Decode, resize and JPEG-encode a source image
+    
+    Args:
+        image_stream: BytesIO holding the whole source image
+    
+    Returns:
+        tuple: (thumbnail buffer positioned at 0, thumbnail size in bytes, source format name)
+    """
+    # Decode image (JPEGs are decoded at a reduced scale when possible)
+    image, image_format = decode_image(image_stream)
+    
+    # Log original image details
+    logger.info("Original image format: %s, Decoded size: %s", image_format, image.size)
+    
+    # Palette images would be resized with NEAREST, so expand them first
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    
+    # Generate thumbnail with fixed size
+    # (no-op when the scaled decode already produced the final size).
+    # reducing_gap makes Pillow box-reduce() by the largest integer factor
+    # that keeps the image at least 2x the target before Lanczos runs
+    image.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    
+    # Convert RGBA to RGB if necessary (for JPEG compatibility); done after
+    # the resize so the blend only touches thumbnail-sized pixels
+    if image.mode in ('RGBA', 'LA'):
+        image = composite_on_white(image)
+    
+    logger.info("Thumbnail generated: %s", image.size)
+    
+    # Save thumbnail to BytesIO buffer
+    # (pre-sized so the encoder never has to grow the buffer)
+    thumbnail_buffer = BytesIO(bytearray(THUMBNAIL_BUFFER_SIZE))
+    thumbnail_buffer.seek(0)
+    # Single-pass baseline encode with 4:2:0 chroma; a second Huffman
+    # optimization pass costs ~2x encode time for sub-KB savings at this size
+    image.save(thumbnail_buffer, format='JPEG', quality=THUMBNAIL_QUALITY, subsampling=2, progressive=False)
+    thumbnail_buffer.truncate()
+    thumbnail_bytes = thumbnail_buffer.tell()
+    thumbnail_buffer.seek(0)
+    
+    return thumbnail_buffer, thumbnail_bytes, image_format
+
+
+def composite_on_white(image):
+    """
+    Flatten an image with an alpha channel onto a white background
+    
+    Only ever called on the resized thumbnail (at most 200x200 = 40k
+    pixels), where NumPy's vectorised ufuncs are already memory-bound and
+    a native compositing kernel would not pay for its call overhead.
+    
+    Args:
+        image: PIL image in RGBA or LA mode
+    
+    Returns:
+        PIL.Image: RGB image
+    """
+    pixels = np.asarray(image.convert('RGBA'), dtype=np.float32)
+    alpha = pixels[..., 3:4] * (1 / 255.0)
+    rgb = pixels[..., :3] * alpha + 255.0 * (1.0 - alpha)
+    return Image.fromarray((rgb + 0.5).astype(np.uint8))
+
+
+def thumbnail_exists(thumbnail_key, thumbnail_metadata):
+    """
+    Check whether the destination already holds the thumbnail for this event
+    
+    A thumbnail only counts when its metadata names the same source bucket,
+    key and ETag, so an overwritten source, or a different source sharing
+    the same basename, is rendered again.
+    
+    Args:
+        thumbnail_key: Destination object key
+        thumbnail_metadata: Metadata the new thumbnail would be written with
+    
+    Returns:
+        bool: True if an up-to-date thumbnail exists, False if missing or stale
+    """
+    # Without the event's ETag there is nothing to match against
+    if not thumbnail_metadata['source-etag']:
+        return False
+    
+    try:
+        response = s3_client.head_object(Bucket=THUMBNAIL_BUCKET, Key=thumbnail_key)
+    except ClientError as head_error:
+        if head_error.response['Error']['Code'] != '404':
+            raise
+        return False
+    
+    stored_metadata = response.get('Metadata', {})
+    return all(
+        stored_metadata.get(name) == thumbnail_metadata[name]
+        for name in ('original-image', 'source-bucket', 'source-etag')
+    )
+
+
+def probe_image(bucket_name, object_key):
+    """
+    Read the first PROBE_BYTES of an S3 object and identify the image
+    
+    Image.open only parses the header, so the dimensions of most JPEG
+    and PNG files are known without downloading or decoding the object.
+    
+    Args:
+        bucket_name: Source bucket
+        object_key: Source object key
+    
+    Returns:
+        tuple: (probe bytes, total object size, ETag, (width, height) or None, format or None)
+    """
+    response = s3_client.get_object(Bucket=bucket_name, Key=object_key, Range=f'bytes=0-{PROBE_BYTES - 1}')
+    probe_data = response['Body'].read()
+    object_size = int(response.get('ContentRange', '').rpartition('/')[2] or len(probe_data))
+    object_etag = response['ETag']
+    
+    try:
+        with Image.open(BytesIO(probe_data)) as probe:
+            return probe_data, object_size, object_etag, probe.size, probe.format
+    except Exception:
+        # Header does not fit in the probe, or not an image; decode in full
+        return probe_data, object_size, object_etag, None, None
+
+
+def download_ranged(bucket_name, object_key, object_size, object_etag, probe_data, parts=RANGED_GET_PARTS):
+    """
+    Download the rest of an S3 object after the probe with ranged GETs
+    
+    The bytes after the probe are split into `parts` ranges that are
+    fetched concurrently, so large sources are not limited by the
+    throughput of a single S3 connection. The probe bytes are never
+    downloaded twice, and each range is written straight to its offset
+    in one buffer allocated at the final size.
+    
+    Every range is pinned to the probe's ETag, so an overwrite during the
+    download fails with PreconditionFailed instead of mixing two objects.
+    
+    Args:
+        bucket_name: Source bucket
+        object_key: Source object key
+        object_size: Total object size in bytes
+        object_etag: ETag returned with the probe
+        probe_data: Leading bytes already read by probe_image
+        parts: Number of ranged GETs to split the remainder into
+    
+    Returns:
+        BytesIO: The complete object
+    """
+    start = len(probe_data)
+    part_size = -(-(object_size - start) // parts)
+    
+    # Grow the stream to its final size once and fill it in place
+    # (BytesIO(bytearray(n)) would copy the buffer a second time)
+    image_stream = BytesIO()
+    image_stream.seek(object_size - 1)
+    image_stream.write(b'\0')
+    
+    with image_stream.getbuffer() as buffer:
+        buffer[:start] = probe_data
+        
+        def fetch_range(offset):
+            end = min(offset + part_size, object_size)
+            response = s3_client.get_object(
+                Bucket=bucket_name,
+                Key=object_key,
+                Range=f'bytes={offset}-{end - 1}',
+                IfMatch=object_etag
+            )
+            read_into(response['Body'], buffer[offset:end])
+        
+        if parts == 1:
+            fetch_range(start)
+        else:
+            with ThreadPoolExecutor(max_workers=parts) as executor:
+                list(executor.map(fetch_range, range(start, object_size, part_size)))
+    
+    image_stream.seek(0)
+    return image_stream
+
+
+def read_into(body, view):
+    """
+    Copy an S3 response body into a preallocated memoryview slice
+    
+    StreamingBody has no readinto() in the botocore versions bundled with
+    the Lambda runtimes, so the body is read in RANGED_GET_CHUNK_SIZE
+    chunks that are each copied straight to their offset.
+    
+    Args:
+        body: botocore StreamingBody of a ranged GET
+        view: Writable memoryview exactly the size of the range
+    """
+    offset = 0
+    for chunk in body.iter_chunks(RANGED_GET_CHUNK_SIZE):
+        view[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+
+
+def decode_image(image_stream):
+    """
+    Decode an image stream into a PIL image
+    
+    JPEGs are decoded by libjpeg-turbo's scaled IDCT at the smallest
+    1/8, 1/4 or 1/2 scale that still covers DECODE_SIZE, so the discarded
+    full-resolution pixels are never materialized. Other formats, and
+    JPEGs TurboJPEG cannot convert to RGB (e.g. CMYK), use Pillow.
+    
+    Args:
+        image_stream: BytesIO holding the whole source (probe plus ranged parts)
+    
+    Returns:
+        tuple: (PIL image, source format name)
+    """
+    if turbo_jpeg is not None:
+        # TurboJPEG wraps the buffer with np.frombuffer, so decoding from the
+        # stream's own view avoids the full copy that read() would make
+        with image_stream.getbuffer() as image_data:
+            if image_data[:2] == b'\xff\xd8':
+                try:
+                    width, height, _, _ = turbo_jpeg.decode_header(image_data)
+                    
+                    # Smallest SIMD downscale that keeps the same margin as draft();
+                    # the other n/8 factors run libjpeg-turbo's scalar reduced IDCTs
+                    scaling_factor = next(
+                        ((num, denom) for num, denom in TURBOJPEG_SCALING_FACTORS
+                         if width * num // denom >= DECODE_SIZE[0] and height * num // denom >= DECODE_SIZE[1]),
+                        (1, 1)
+                    )
+                    
+                    pixels = turbo_jpeg.decode(image_data, pixel_format=TJPF_RGB, scaling_factor=scaling_factor)
+                    return Image.fromarray(pixels), 'JPEG'
+                except OSError as turbo_error:
+                    logger.warning("TurboJPEG decode failed, falling back to Pillow: %s", turbo_error)
+        
+        image_stream.seek(0)
+    
+    # Only the header is parsed until load(), so draft() can still pick a scale
+    image = Image.open(image_stream)
+    
+    # Let libjpeg decode at 1/2, 1/4 or 1/8 scale, keeping at least 2x the
+    # thumbnail size so the Lanczos pass still has enough source pixels
+    # (camera/phone JPEGs with an MPF segment open as 'MPO')
+    if image.format in ('JPEG', 'MPO'):
+        image.draft(None, DECODE_SIZE)
+    
+    image.load()
+    return image, image.format
+
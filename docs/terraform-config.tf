@@ -47,6 +47,12 @@ variable "thumbnail_size" {
   default     = "200x200"
 }
 
+variable "lambda_architecture" {
+  description = "Lambda instruction set architecture (arm64 for Graviton, or x86_64 for Pillow-SIMD AVX2)"
+  type        = string
+  default     = "arm64"
+}
+
 variable "sns_email" {
   description = "Email address for SNS notifications"
   type        = string
@@ -238,9 +244,17 @@ resource "aws_iam_role_policy" "lambda_s3_policy" {
       {
         Effect = "Allow"
         Action = [
+          "s3:GetObject",
           "s3:PutObject"
         ]
         Resource = "${aws_s3_bucket.destination_thumbnails.arn}/*"
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:ListBucket"
+        ]
+        Resource = aws_s3_bucket.destination_thumbnails.arn
       }
     ]
   })
@@ -269,24 +283,23 @@ resource "aws_iam_role_policy" "lambda_sns_policy" {
 # LAMBDA LAYER FOR PILLOW
 # ============================================================================
 
-# Note: This assumes you have a layer zip file locally
-# To create: mkdir python/lib/python3.9/site-packages
-#           pip install Pillow -t python/lib/python3.9/site-packages/
-#           zip -r pillow-layer.zip python/
+# Note: This expects pillow-layer.zip next to this file
+# To create: run build_pillow_layer from deploy.sh, which compiles
+#           Pillow against libjpeg-turbo in the Lambda build image
+#           (python:3.11-arm64; on python:3.11-x86_64 build Pillow-SIMD==9.5.0.post1
+#           with CC="cc -mavx2" instead):
+#           yum install -y gcc libjpeg-turbo-devel turbojpeg zlib-devel
+#           pip install --no-binary :all: Pillow==9.5.0 -t python/
+#           pip install PyTurboJPEG numpy -t python/
+#           cp -P /usr/lib64/libjpeg.so.62* /usr/lib64/libturbojpeg.so.0* lib/
+#           zip -r -y pillow-layer.zip python/ lib/
 
 resource "aws_lambda_layer_version" "pillow" {
-  # Uncomment if you have the layer file locally
-  # filename   = "pillow-layer.zip"
-  # layer_name = "${var.project_name}-pillow-layer"
-  # source_code_hash = filebase64sha256("pillow-layer.zip")
-  # compatible_runtimes = ["python3.9", "python3.10", "python3.11", "python3.12"]
-  
-  # For now, we'll use the AWS managed Python Image Processing layer
-  # Comment out the below if using local layer
-
-  lifecycle {
-    ignore_changes = all
-  }
+  filename                 = "pillow-layer.zip"
+  layer_name               = "${var.project_name}-pillow-layer"
+  source_code_hash         = filebase64sha256("pillow-layer.zip")
+  compatible_runtimes      = ["python3.11"]
+  compatible_architectures = [var.lambda_architecture]
 }
 
 # ============================================================================
@@ -299,20 +312,23 @@ resource "aws_lambda_function" "thumbnail_generator" {
   role          = aws_iam_role.lambda_role.arn
   handler       = "index.lambda_handler"
   runtime       = "python3.11"
+  architectures = [var.lambda_architecture]
   timeout       = 30
   memory_size   = 512
 
   environment {
     variables = {
-      THUMBNAIL_BUCKET = aws_s3_bucket.destination_thumbnails.bucket
-      SNS_TOPIC_ARN    = aws_sns_topic.image_processing.arn
+      THUMBNAIL_BUCKET   = aws_s3_bucket.destination_thumbnails.bucket
+      SNS_TOPIC_ARN      = aws_sns_topic.image_processing.arn
+      TURBOJPEG_LIB_PATH = "/opt/lib/libturbojpeg.so.0" # shipped in the Pillow layer below
+      LOG_LEVEL          = "WARNING"
     }
   }
 
   source_code_hash = filebase64sha256("lambda_function.zip")
 
-  # Uncomment to add Pillow layer if you created it
-  # layers = [aws_lambda_layer_version.pillow.arn]
+  # Pillow, PyTurboJPEG, numpy and libturbojpeg.so come from the layer
+  layers = [aws_lambda_layer_version.pillow.arn]
 
   tags = {
     Name = "${var.project_name}-lambda-function"
@@ -4,55 +4,202 @@ import os
 from PIL import Image
 from io import BytesIO
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
-s3_client = boto3.client('s3')
-sns_client = boto3.client('sns')
+aws_config = Config(max_pool_connections=32, retries={'max_attempts': 3, 'mode': 'adaptive'}, tcp_keepalive=True)
+s3_client = boto3.client('s3', config=aws_config)
+sns_client = boto3.client('sns', config=aws_config)
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    turbo_jpeg = TurboJPEG(os.environ.get('TURBOJPEG_LIB_PATH'))
+except (ImportError, RuntimeError, OSError):
+    turbo_jpeg = None
 
 THUMBNAIL_BUCKET = os.environ.get('THUMBNAIL_BUCKET')
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
 THUMBNAIL_SIZE = (200, 200)
+THUMBNAIL_BUFFER_SIZE = max(8192, THUMBNAIL_SIZE[0] * THUMBNAIL_SIZE[1] // 4)
+DECODE_SIZE = (THUMBNAIL_SIZE[0] * 2, THUMBNAIL_SIZE[1] * 2)
+TURBOJPEG_SCALING_FACTORS = ((1, 8), (1, 4), (1, 2))
+MAX_WORKERS = 8
+SNS_BATCH_SIZE = 10
+PROBE_BYTES = 64 * 1024
+RANGED_GET_THRESHOLD = 8 * 1024 * 1024
+RANGED_GET_PARTS = 4
+RANGED_GET_CHUNK_SIZE = 1024 * 1024
+
+def warm_up_codecs():
+    warm_buffer = BytesIO()
+    Image.new('RGB', (16, 16)).save(warm_buffer, format='JPEG', quality=80)
+    Image.open(BytesIO(warm_buffer.getvalue())).load()
+    if turbo_jpeg is not None:
+        turbo_jpeg.decode(warm_buffer.getvalue())
+
+warm_up_codecs()
+
+def decode_image(image_stream):
+    if turbo_jpeg is not None:
+        with image_stream.getbuffer() as image_data:
+            if image_data[:2] == b'\xff\xd8':
+                try:
+                    width, height, _, _ = turbo_jpeg.decode_header(image_data)
+                    scaling_factor = next(
+                        ((num, denom) for num, denom in TURBOJPEG_SCALING_FACTORS
+                         if width * num // denom >= DECODE_SIZE[0] and height * num // denom >= DECODE_SIZE[1]),
+                        (1, 1)
+                    )
+                    return Image.fromarray(turbo_jpeg.decode(image_data, pixel_format=TJPF_RGB, scaling_factor=scaling_factor))
+                except OSError as e:
+                    logger.warning("TurboJPEG decode failed, using Pillow: %s", e)
+        image_stream.seek(0)
+    image = Image.open(image_stream)
+    if image.format in ('JPEG', 'MPO'):
+        image.draft(None, DECODE_SIZE)
+    image.load()
+    return image
+
+def render_thumbnail(image_stream):
+    image = decode_image(image_stream)
+    image.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    
+    thumbnail_buffer = BytesIO(bytearray(THUMBNAIL_BUFFER_SIZE))
+    thumbnail_buffer.seek(0)
+    image.save(thumbnail_buffer, format='JPEG', quality=80)
+    thumbnail_buffer.truncate()
+    thumbnail_buffer.seek(0)
+    return thumbnail_buffer
+
+def download_ranged(bucket, key, object_size, etag, probe_data, parts=RANGED_GET_PARTS):
+    start = len(probe_data)
+    part_size = -(-(object_size - start) // parts)
+    
+    image_stream = BytesIO()
+    image_stream.seek(object_size - 1)
+    image_stream.write(b'\0')
+    
+    with image_stream.getbuffer() as buffer:
+        buffer[:start] = probe_data
+        
+        def fetch_range(offset):
+            end = min(offset + part_size, object_size)
+            body = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes={offset}-{end - 1}', IfMatch=etag)['Body']
+            position = offset
+            for chunk in body.iter_chunks(RANGED_GET_CHUNK_SIZE):
+                buffer[position:position + len(chunk)] = chunk
+                position += len(chunk)
+        
+        if parts == 1:
+            fetch_range(start)
+        else:
+            with ThreadPoolExecutor(max_workers=parts) as executor:
+                list(executor.map(fetch_range, range(start, object_size, part_size)))
+    
+    image_stream.seek(0)
+    return image_stream
+
+def process_record(record):
+    bucket = record['s3']['bucket']['name']
+    key = record['s3']['object']['key']
+    logger.info("Processing image: %s from bucket: %s", key, bucket)
+    
+    thumbnail_key = f"thumbnails/{os.path.splitext(key)[0]}_thumb.jpg"
+    metadata = {'original-image': key, 'source-bucket': bucket, 'source-etag': record['s3']['object'].get('eTag', '')}
+    
+    if metadata['source-etag']:
+        try:
+            if s3_client.head_object(Bucket=THUMBNAIL_BUCKET, Key=thumbnail_key).get('Metadata', {}) == metadata:
+                logger.info("Thumbnail already up to date, skipping: %s", thumbnail_key)
+                return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != '404':
+                raise
+    
+    response = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes=0-{PROBE_BYTES - 1}')
+    probe_data = response['Body'].read()
+    object_size = int(response.get('ContentRange', '').rpartition('/')[2] or len(probe_data))
+    try:
+        with Image.open(BytesIO(probe_data)) as probe:
+            small_jpeg = probe.format == 'JPEG' and max(probe.size) <= max(THUMBNAIL_SIZE)
+    except Exception:
+        small_jpeg = False
+    
+    if small_jpeg:
+        s3_client.copy_object(
+            CopySource={'Bucket': bucket, 'Key': key},
+            Bucket=THUMBNAIL_BUCKET,
+            Key=thumbnail_key,
+            ContentType='image/jpeg',
+            MetadataDirective='REPLACE',
+            Metadata=metadata
+        )
+    else:
+        if object_size <= len(probe_data):
+            image_stream = BytesIO(probe_data)
+        else:
+            parts = RANGED_GET_PARTS if object_size > RANGED_GET_THRESHOLD else 1
+            image_stream = download_ranged(bucket, key, object_size, response['ETag'], probe_data, parts)
+        thumbnail_buffer = render_thumbnail(image_stream)
+        
+        s3_client.put_object(
+            Bucket=THUMBNAIL_BUCKET,
+            Key=thumbnail_key,
+            Body=thumbnail_buffer,
+            ContentType='image/jpeg',
+            Metadata=metadata
+        )
+    
+    message = f"Image Processing Complete!\nOriginal Image: {key}\nOriginal Bucket: {bucket}\nThumbnail Created: {thumbnail_key}\nThumbnail Bucket: {THUMBNAIL_BUCKET}"
+    
+    logger.info("Thumbnail created: %s", thumbnail_key)
+    return {'Subject': 'Image Thumbnail Generated Successfully', 'Message': message}
+
+def publish_notifications(notifications):
+    for start in range(0, len(notifications), SNS_BATCH_SIZE):
+        response = sns_client.publish_batch(
+            TopicArn=SNS_TOPIC_ARN,
+            PublishBatchRequestEntries=[
+                {'Id': str(start + index), **notification}
+                for index, notification in enumerate(notifications[start:start + SNS_BATCH_SIZE])
+            ]
+        )
+        for failure in response.get('Failed', []):
+            logger.error("Failed to send notification %s: %s", failure['Id'], failure.get('Message'))
 
 def lambda_handler(event, context):
     try:
-        for record in event['Records']:
-            bucket = record['s3']['bucket']['name']
-            key = record['s3']['object']['key']
-            logger.info(f"Processing image: {key} from bucket: {bucket}")
-            
-            response = s3_client.get_object(Bucket=bucket, Key=key)
-            image_data = response['Body'].read()
-            
-            image = Image.open(BytesIO(image_data))
-            image.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-            
-            thumbnail_buffer = BytesIO()
-            image.save(thumbnail_buffer, format='JPEG', quality=80)
-            thumbnail_buffer.seek(0)
-            
-            thumbnail_key = f"thumbnails/{os.path.splitext(key)[0]}_thumb.jpg"
-            
-            s3_client.put_object(
-                Bucket=THUMBNAIL_BUCKET,
-                Key=thumbnail_key,
-                Body=thumbnail_buffer.getvalue(),
-                ContentType='image/jpeg'
-            )
-            
-            message = f"Image Processing Complete!\nOriginal Image: {key}\nOriginal Bucket: {bucket}\nThumbnail Created: {thumbnail_key}\nThumbnail Bucket: {THUMBNAIL_BUCKET}"
-            
-            sns_client.publish(
-                TopicArn=SNS_TOPIC_ARN,
-                Subject='Image Thumbnail Generated Successfully',
-                Message=message
-            )
-            
-            logger.info(f"Thumbnail created: {thumbnail_key}")
+        records = event['Records']
+        notifications = []
+        record_error = None
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(records) or 1)) as executor:
+            futures = [executor.submit(process_record, record) for record in records]
+            for future in as_completed(futures):
+                try:
+                    notification = future.result()
+                except Exception as e:
+                    logger.error("Error processing record: %s", e)
+                    record_error = record_error or e
+                    continue
+                if notification is not None:
+                    notifications.append(notification)
+        
+        # Publish for every record that succeeded before surfacing the first failure
+        try:
+            publish_notifications(notifications)
+        except Exception as e:
+            if record_error is None:
+                raise
+            logger.error("Error sending notifications: %s", e)
+        if record_error is not None:
+            raise record_error
         
         return {'statusCode': 200, 'body': json.dumps('Thumbnails generated successfully!')}
     except Exception as e:
-        logger.error(f"Error processing image: {str(e)}")
+        logger.error("Error processing image: %s", e)
         sns_client.publish(
             TopicArn=SNS_TOPIC_ARN,
             Subject='Image Processing Error',